@@ -1,20 +1,44 @@
 from __future__ import annotations
 
+import errno
+import hashlib
+import heapq
 import json
+import mimetypes
+import multiprocessing as mp
 import os
 import secrets
 import shutil
-from datetime import timedelta
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from pathlib import Path
+from queue import Empty
 from typing import Optional
+from urllib.parse import quote as url_quote
 
 try:
     import cv2
 except ModuleNotFoundError:
     cv2 = None
+else:
+    # Thumbnail pool workers already run in parallel; keep each decode single-threaded.
+    cv2.setNumThreads(1)
 
-from flask import Flask, abort, flash, redirect, render_template, request, send_file, session, url_for
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ModuleNotFoundError:
+    FileSystemEventHandler = object
+    Observer = None
+
+from flask import Flask, Response, abort, flash, redirect, render_template, request, send_from_directory, session, url_for
+from flask.sessions import SecureCookieSessionInterface
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -23,8 +47,12 @@ from flask_login import (
     login_user,
     logout_user,
 )
+from werkzeug.datastructures import ContentRange
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.http import is_resource_modified
 from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
 
 # ---------------- APP CONFIG ----------------
 
@@ -38,6 +66,21 @@ app.config.update(
     MAX_CONTENT_LENGTH=1024 * 1024 * 1024,  # 1GB upload limit
 )
 
+
+class Blake2SessionInterface(SecureCookieSessionInterface):
+    """Signs the session cookie with HMAC-BLAKE2b instead of the default HMAC-SHA1."""
+
+    salt = "cookie-session"
+    digest_method = staticmethod(hashlib.blake2b)
+
+
+app.session_interface = Blake2SessionInterface()
+
+# Let the front-end server stream media: FLASK_USE_X_SENDFILE=1 for Apache/lighttpd,
+# FLASK_X_ACCEL_PREFIX=/_protected for nginx (see README).
+X_ACCEL_PREFIX = os.getenv("FLASK_X_ACCEL_PREFIX", "").rstrip("/")
+app.config["USE_X_SENDFILE"] = os.getenv("FLASK_USE_X_SENDFILE") == "1" or bool(X_ACCEL_PREFIX)
+
 # ---------------- PATH CONFIG ----------------
 
 BASE_DIR = Path(r"E:\server--\vedio-local")
@@ -60,6 +103,25 @@ VIDEO_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov", ".webm"}
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 MEDIA_EXTENSIONS = VIDEO_EXTENSIONS | IMAGE_EXTENSIONS
 
+
+def file_extension(filename: str) -> str:
+    """Lower-cased last suffix (".mp4"), or "" like Path.suffix when there is none.
+
+    A leading dot (".mp4", "dir/.mp4") starts a bare name, not an extension.
+    """
+    dot = filename.rfind(".")
+    if dot <= 0 or filename[dot - 1] in "/\\":
+        return ""
+    return filename[dot:].lower()
+
+
+def is_video(filename: str) -> bool:
+    return file_extension(filename) in VIDEO_EXTENSIONS
+
+
+def is_image(filename: str) -> bool:
+    return file_extension(filename) in IMAGE_EXTENSIONS
+
 # ---------------- AUTO CREATE DIRS ----------------
 
 for p in [
@@ -72,6 +134,12 @@ for p in [
 ]:
     p.mkdir(parents=True, exist_ok=True)
 
+_BASE_RESOLVED = {
+    p: os.path.realpath(p)
+    for p in (VIDEO_PATH, IMAGE_PATH, THUMB_PATH, ALT_THUMB_PATH, PENDING_PATH)
+}
+_ASSETS_RESOLVED = os.path.realpath(BASE_DIR / "assets")
+
 # ---------------- AUTH HELPERS ----------------
 
 def _read_json_file(file_path: Path, default):
@@ -84,16 +152,39 @@ def _read_json_file(file_path: Path, default):
         return default
 
 
+_HASH_PREFIXES = frozenset({"pbkdf2:", "scrypt:"})
+
+
 def _verify_password(saved_password: str, entered_password: str) -> bool:
     if not saved_password:
         return False
-    if saved_password.startswith(("pbkdf2:", "scrypt:")):
+    if saved_password[:7] in _HASH_PREFIXES:
         return check_password_hash(saved_password, entered_password)
-    return secrets.compare_digest(saved_password, entered_password)
+    # compare_digest rejects non-ASCII str, so compare the UTF-8 bytes.
+    return secrets.compare_digest(saved_password.encode("utf-8"), entered_password.encode("utf-8"))
 
 
-def load_login_users():
-    raw = _read_json_file(LOGIN_PASS_FILE, default={})
+_USERS_CACHE = {"mtime": 0, "size": -1, "data": {}}
+_ADMIN_CACHE = {"mtime": 0, "size": -1, "data": ""}
+_AUTH_CACHE_LOCK = threading.Lock()
+
+
+def _load_cached_json(file_path: Path, cache: dict, parse):
+    """Parse file_path once and reuse the result until its mtime or size changes."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return parse({})
+
+    with _AUTH_CACHE_LOCK:
+        if cache["mtime"] == stat.st_mtime_ns and cache["size"] == stat.st_size:
+            return cache["data"]
+        data = parse(_read_json_file(file_path, default={}))
+        cache.update(mtime=stat.st_mtime_ns, size=stat.st_size, data=data)
+        return data
+
+
+def _parse_login_users(raw):
     users = {}
 
     if isinstance(raw, dict) and "users" in raw and isinstance(raw["users"], list):
@@ -119,8 +210,7 @@ def load_login_users():
     return users
 
 
-def load_admin_secret():
-    raw = _read_json_file(ADMIN_PASS_FILE, default={})
+def _parse_admin_secret(raw):
     if isinstance(raw, dict):
         password = raw.get("password") or raw.get("admin_password")
         if password:
@@ -130,6 +220,14 @@ def load_admin_secret():
     return ""
 
 
+def load_login_users():
+    return _load_cached_json(LOGIN_PASS_FILE, _USERS_CACHE, _parse_login_users)
+
+
+def load_admin_secret():
+    return _load_cached_json(ADMIN_PASS_FILE, _ADMIN_CACHE, _parse_admin_secret)
+
+
 # ---------------- LOGIN SYSTEM ----------------
 
 class User(UserMixin):
@@ -165,14 +263,18 @@ def admin_required(view_func):
 
 # ---------------- SECURITY ----------------
 
+def _resolved_base(base_path: Path) -> str:
+    return _BASE_RESOLVED.get(base_path) or os.path.realpath(base_path)
+
+
 def safe_media_path(base_path: Path, filename: str) -> Path:
     clean_name = secure_filename(filename)
-    candidate = (base_path / clean_name).resolve()
-    base_resolved = base_path.resolve()
+    base_resolved = _resolved_base(base_path)
+    candidate = os.path.realpath(os.path.join(base_resolved, clean_name))
 
-    if base_resolved not in candidate.parents and candidate != base_resolved:
+    if candidate != base_resolved and not candidate.startswith(base_resolved + os.sep):
         abort(400)
-    return candidate
+    return Path(candidate)
 
 
 def find_existing_file(base_path: Path, filename: str) -> Optional[Path]:
@@ -185,7 +287,7 @@ def find_existing_file(base_path: Path, filename: str) -> Optional[Path]:
     requested_lower = requested_name.lower()
     requested_secure = secure_filename(requested_name).lower()
 
-    for existing in base_path.iterdir():
+    for existing in Path(_resolved_base(base_path)).iterdir():
         if not existing.is_file():
             continue
         name_lower = existing.name.lower()
@@ -197,15 +299,195 @@ def find_existing_file(base_path: Path, filename: str) -> Optional[Path]:
     return None
 
 
+def _scan_names(base_path: Path) -> list:
+    with os.scandir(base_path) as it:
+        return sorted(e.name for e in it if e.is_file(follow_symlinks=False))
+
+
+_DIR_CACHE = {}
+
+
+def _listing(base_path: Path, videos_only: bool = False) -> list:
+    """Sorted file names in base_path, rescanned only when the directory's mtime changes."""
+    mtime = os.stat(base_path).st_mtime_ns
+    cached = _DIR_CACHE.get(base_path)
+    if not cached or cached[0] != mtime:
+        names = _scan_names(base_path)
+        cached = (mtime, names, [f for f in names if is_video(f)])
+        _DIR_CACHE[base_path] = cached
+    return cached[2] if videos_only else cached[1]
+
+
+def send_media(file_path: Path):
+    return send_from_directory(file_path.parent, file_path.name, conditional=True)
+
+
+def _iter_file_range(fh, length: int, chunk_size: int = 64 * 1024):
+    while length > 0:
+        chunk = fh.read(min(chunk_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def _if_range_matches(etag: str, last_modified: datetime) -> bool:
+    """True when a Range request may be honoured, i.e. If-Range is absent or still current."""
+    raw = request.environ.get("HTTP_IF_RANGE")
+    if raw is None:
+        return True
+    # If-Range needs a strong comparison, but werkzeug strips the W/ prefix when parsing.
+    if raw.lstrip().startswith("W/"):
+        return False
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return if_range.date == last_modified
+    # Unparsable values never match.
+    return False
+
+
+def stream_media_file(file_path: Path):
+    """Stream a file through wsgi.file_wrapper so servers like gunicorn can use sendfile(2)."""
+    if app.config["USE_X_SENDFILE"]:
+        return send_media(file_path)
+
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = f"{stat.st_mtime_ns:x}-{size:x}"
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+
+    start, stop = 0, size
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1 and _if_range_matches(etag, last_modified):
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            raise RequestedRangeNotSatisfiable(length=size)
+        start, stop = bounds
+
+    fh = open(file_path, "rb")
+    fh.seek(start)
+    # An open-ended range ("bytes=N-", what browsers send for video) runs to EOF,
+    # so it can still go through the file wrapper; bounded ranges are read in chunks.
+    body = wrap_file(request.environ, fh) if stop == size else _iter_file_range(fh, stop - start)
+
+    response = Response(
+        body,
+        status=206 if (start, stop) != (0, size) else 200,
+        mimetype=mimetypes.guess_type(file_path.name)[0] or "application/octet-stream",
+        direct_passthrough=True,
+    )
+    response.call_on_close(fh.close)
+    response.accept_ranges = "bytes"
+    response.content_length = stop - start
+    if response.status_code == 206:
+        response.content_range = ContentRange("bytes", start, stop, size)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+@app.after_request
+def x_accel_redirect(response):
+    sendfile_path = response.headers.get("X-Sendfile")
+    if not X_ACCEL_PREFIX or not sendfile_path:
+        return response
+
+    # Media paths come from safe_media_path()/find_existing_file(), which are already resolved.
+    if sendfile_path.startswith(_ASSETS_RESOLVED + os.sep):
+        relative = os.path.relpath(sendfile_path, _ASSETS_RESOLVED).replace(os.sep, "/")
+        del response.headers["X-Sendfile"]
+        response.headers["X-Accel-Redirect"] = f"{X_ACCEL_PREFIX}/{url_quote(relative)}"
+    return response
+
+
+def move_file(source: Path, destination: Path) -> None:
+    try:
+        os.replace(source, destination)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+        shutil.move(str(source), str(destination))
+
+
 def allowed_file(filename: str) -> bool:
-    return Path(filename).suffix.lower() in MEDIA_EXTENSIONS
+    return file_extension(filename) in MEDIA_EXTENSIONS
 
 
 def media_kind(filename: str) -> str:
-    return "video" if Path(filename).suffix.lower() in VIDEO_EXTENSIONS else "image"
+    return "video" if is_video(filename) else "image"
+
+
+# ---------------- THUMBNAIL ENGINE ----------------
+
+THUMB_SEEK_SECONDS = 2
+
+
+def _open_capture(video_file_path: str):
+    params = []
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    try:
+        cap = cv2.VideoCapture(video_file_path, cv2.CAP_FFMPEG, params)
+    except (TypeError, cv2.error):
+        cap = cv2.VideoCapture(video_file_path, cv2.CAP_FFMPEG)
+    if cap.isOpened():
+        return cap
+    # FFmpeg backend unavailable: let OpenCV pick one.
+    cap.release()
+    return cv2.VideoCapture(video_file_path)
 
 
-# ---------------- OPENCV THUMBNAIL ENGINE ----------------
+def _grab_thumbnail_frame(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    target = int(fps * THUMB_SEEK_SECONDS)
+
+    # A keyframe seek followed by grab()/retrieve() decodes one frame. Containers that
+    # cannot seek fall back to grabbing forward, which still decodes every skipped frame
+    # (grab() only skips the BGR conversion) but avoids converting frames we discard.
+    if target and cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+        grabbed = cap.grab()
+    else:
+        grabbed = False
+        for _ in range(target + 1):
+            if not cap.grab():
+                break
+            grabbed = True
+
+    if grabbed:
+        success, frame = cap.retrieve()
+        if success:
+            return True, frame
+
+    cap.set(cv2.CAP_PROP_POS_MSEC, THUMB_SEEK_SECONDS * 1000)
+    return cap.read()
+
+
+def _temp_thumb_path(thumb_file_path: str) -> str:
+    # Same folder as the final file so os.replace() stays atomic; keep .jpg so the
+    # encoders pick JPEG, and a random part so concurrent writers never share a file.
+    head, name = os.path.split(thumb_file_path)
+    return os.path.join(head, f".{name[:-4]}.{secrets.token_hex(4)}.tmp.jpg")
+
+
+def _publish_thumb(tmp_path: str, thumb_file_path: str, written: bool) -> bool:
+    """Move a finished thumbnail into place, or discard it; readers never see a partial file."""
+    try:
+        if written and os.path.exists(tmp_path):
+            os.replace(tmp_path, thumb_file_path)
+            return True
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 
 def generate_thumbnail_opencv(video_filename):
     if cv2 is None:
@@ -217,22 +499,277 @@ def generate_thumbnail_opencv(video_filename):
     if os.path.exists(thumb_file_path):
         return True
 
-    cap = cv2.VideoCapture(video_file_path)
+    cap = _open_capture(video_file_path)
     if not cap.isOpened():
         return False
 
-    cap.set(cv2.CAP_PROP_POS_MSEC, 2000)
-    success, frame = cap.read()
+    success, frame = _grab_thumbnail_frame(cap)
+    cap.release()
+    if not success:
+        return False
 
-    if success:
-        h, w = frame.shape[:2]
-        resized = cv2.resize(frame, (400, int(h * (400 / w))))
-        cv2.imwrite(thumb_file_path, resized)
+    h, w = frame.shape[:2]
+    resized = cv2.resize(frame, (400, int(h * (400 / w))), interpolation=cv2.INTER_AREA)
+    tmp_path = _temp_thumb_path(thumb_file_path)
+    written = cv2.imwrite(tmp_path, resized, [
+        int(cv2.IMWRITE_JPEG_QUALITY), 80,
+        int(cv2.IMWRITE_JPEG_OPTIMIZE), 1,
+        int(cv2.IMWRITE_JPEG_PROGRESSIVE), 1,
+    ])
+    return _publish_thumb(tmp_path, thumb_file_path, written)
 
-    cap.release()
+
+FFMPEG_BIN = shutil.which("ffmpeg")
+
+
+def generate_thumbnail_ffmpeg(video_filename):
+    if FFMPEG_BIN is None:
+        return False
+
+    video_file_path = str(VIDEO_PATH / video_filename)
+    thumb_file_path = str(THUMB_PATH / f"{Path(video_filename).stem}.jpg")
+
+    if os.path.exists(thumb_file_path):
+        return True
+
+    tmp_path = _temp_thumb_path(thumb_file_path)
+    # -ss before -i seeks to the nearest keyframe instead of decoding up to it.
+    command = [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+        # Input options: -threads here limits the decoder, the expensive part.
+        "-hwaccel", "auto", "-threads", "1",
+        "-ss", str(THUMB_SEEK_SECONDS),
+        "-i", video_file_path,
+        "-an", "-sn",
+        "-frames:v", "1",
+        "-vf", "scale=400:-1",
+        "-q:v", "5",
+        "-y", tmp_path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return _publish_thumb(tmp_path, thumb_file_path, False)
+    return _publish_thumb(tmp_path, thumb_file_path, result.returncode == 0)
+
+
+def generate_thumbnail(video_filename):
+    return generate_thumbnail_opencv(video_filename) or generate_thumbnail_ffmpeg(video_filename)
+
+
+THUMB_WAIT_SECONDS = 10
+
+_THUMB_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4), thread_name_prefix="thumb")
+_THUMB_INFLIGHT = {}
+_THUMB_INFLIGHT_LOCK = threading.Lock()
+# (video name, mtime_ns) pairs that failed; a changed file gets retried.
+_THUMB_FAILURES = set()
+
+
+def _video_mtime(video_filename) -> Optional[int]:
+    try:
+        return os.stat(VIDEO_PATH / video_filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _generate_thumbnail_task(video_filename, mtime):
+    try:
+        success = generate_thumbnail(video_filename)
+    except Exception:
+        app.logger.exception("Thumbnail generation failed for %s", video_filename)
+        success = False
+    if not success:
+        _THUMB_FAILURES.add((video_filename, mtime))
     return success
 
 
+def try_thumbnail(video_filename) -> bool:
+    """Generate synchronously unless this exact file already failed."""
+    mtime = _video_mtime(video_filename)
+    if (video_filename, mtime) in _THUMB_FAILURES:
+        return False
+    return _generate_thumbnail_task(video_filename, mtime)
+
+
+def submit_thumbnail(video_filename):
+    """Queue thumbnail generation, sharing the future with any request already waiting on it.
+
+    Returns None when this exact file already failed to produce a thumbnail.
+    """
+    mtime = _video_mtime(video_filename)
+    if (video_filename, mtime) in _THUMB_FAILURES:
+        return None
+
+    with _THUMB_INFLIGHT_LOCK:
+        future = _THUMB_INFLIGHT.get(video_filename)
+        if future is None:
+            future = _THUMB_POOL.submit(_generate_thumbnail_task, video_filename, mtime)
+            _THUMB_INFLIGHT[video_filename] = future
+            future.add_done_callback(lambda _f: _THUMB_INFLIGHT.pop(video_filename, None))
+        return future
+
+
+def missing_thumbnails(settle_seconds: float = 0):
+    """Videos without a thumbnail, skipping any modified within the last settle_seconds."""
+    missing = []
+    newest = time.time() - settle_seconds
+    with os.scandir(VIDEO_PATH) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False) or not is_video(entry.name):
+                continue
+            if settle_seconds and entry.stat(follow_symlinks=False).st_mtime > newest:
+                continue
+            if not (THUMB_PATH / f"{Path(entry.name).stem}.jpg").exists():
+                missing.append(entry.name)
+    return missing
+
+
+_VIDEO_STEM_CACHE = {"mtime": 0, "data": {}}
+_VIDEO_STEM_LOCK = threading.Lock()
+
+
+def find_video_for_thumb(thumb_name: str) -> Optional[str]:
+    """Map a requested thumbnail name back to the video it is generated from."""
+    try:
+        mtime = os.stat(VIDEO_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+    with _VIDEO_STEM_LOCK:
+        if _VIDEO_STEM_CACHE["mtime"] != mtime:
+            stems = {}
+            with os.scandir(VIDEO_PATH) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False) and is_video(entry.name):
+                        stems[Path(entry.name).stem] = entry.name
+            _VIDEO_STEM_CACHE.update(mtime=mtime, data=stems)
+        return _VIDEO_STEM_CACHE["data"].get(Path(thumb_name).stem)
+
+
+_STATIC_RENDER_CACHE = {}
+
+
+def _cached_render(template_name: str) -> str:
+    """Render a page with no per-request data once per user/admin state and reuse the HTML."""
+    # Flashed messages are consumed by the render, so those responses are always fresh.
+    if app.debug or "_flashes" in session:
+        return render_template(template_name)
+
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    key = (template_name, user_id, bool(session.get("is_admin")))
+    html = _STATIC_RENDER_CACHE.get(key)
+    if html is None:
+        html = render_template(template_name)
+        _STATIC_RENDER_CACHE[key] = html
+    return html
+
+
+def _clear_render_cache(*_args):
+    _STATIC_RENDER_CACHE.clear()
+
+
+# ---------------- BACKGROUND THUMBNAIL WORKER ----------------
+
+THUMB_POLL_SECONDS = 30
+THUMB_SETTLE_SECONDS = 5
+
+_THUMB_QUEUE = None
+_THUMB_QUEUE_PID = None
+
+
+class _VideoFolderHandler(FileSystemEventHandler):
+    """Queue videos once they stop changing, so a copy in progress is not thumbnailed."""
+
+    def __init__(self, put):
+        super().__init__()
+        self._put = put
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def _schedule(self, path):
+        name = os.path.basename(path)
+        if not is_video(name):
+            return
+        with self._lock:
+            timer = self._timers.pop(name, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(THUMB_SETTLE_SECONDS, self._settled, args=(name,))
+            timer.daemon = True
+            self._timers[name] = timer
+            timer.start()
+
+    def _settled(self, name):
+        with self._lock:
+            self._timers.pop(name, None)
+        self._put(name)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._schedule(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._schedule(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._schedule(event.dest_path)
+
+
+def _thumb_worker(queue):
+    """Thumbnail process: handle queued names, and sweep VIDEO_PATH whenever it is idle."""
+    # The folder watcher lives here rather than in the web process, so nothing that
+    # web servers fork (e.g. the gunicorn master) is running extra threads.
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(_VideoFolderHandler(queue.put), str(VIDEO_PATH), recursive=False)
+        observer.daemon = True
+        observer.start()
+
+    names = missing_thumbnails(settle_seconds=THUMB_SETTLE_SECONDS)
+    while True:
+        for video_filename in names:
+            if video_filename is None:
+                return
+            try_thumbnail(video_filename)
+        try:
+            names = [queue.get(timeout=THUMB_POLL_SECONDS)]
+        except Empty:
+            # Processes that cannot reach the queue (forked web workers) rely on this sweep.
+            names = missing_thumbnails(settle_seconds=THUMB_SETTLE_SECONDS)
+
+
+def thumbnail_worker_started() -> bool:
+    return _THUMB_QUEUE is not None
+
+
+def enqueue_thumbnail(video_filename: str) -> bool:
+    """Hand a video to the worker process; returns False when it has to wait for the next sweep.
+
+    Only the process that created the queue may put to it. A copy made by os.fork()
+    (a gunicorn worker) inherits the queue without its feeder thread, so puts there
+    would sit in a buffer forever.
+    """
+    if _THUMB_QUEUE is None or _THUMB_QUEUE_PID != os.getpid() or not is_video(video_filename):
+        return False
+    _THUMB_QUEUE.put(video_filename)
+    return True
+
+
+def start_thumbnail_worker():
+    global _THUMB_QUEUE, _THUMB_QUEUE_PID
+    if _THUMB_QUEUE is not None:
+        return
+
+    # spawn on every platform: forking a process that already runs Flask threads is unsafe.
+    ctx = mp.get_context("spawn")
+    _THUMB_QUEUE = ctx.Queue()
+    _THUMB_QUEUE_PID = os.getpid()
+    ctx.Process(target=_thumb_worker, args=(_THUMB_QUEUE,), name="thumb-worker", daemon=True).start()
+
+
 # ---------------- ROUTES ----------------
 
 @app.route("/login", methods=["GET", "POST"])
@@ -256,7 +793,7 @@ def login():
         flash("Wrong username or password")
         return redirect(url_for("login"))
 
-    return render_template("login.html")
+    return _cached_render("login.html")
 
 
 @app.route("/admin/login", methods=["GET", "POST"])
@@ -274,24 +811,40 @@ def admin_login():
         flash("Invalid admin password.")
         return redirect(url_for("admin_login"))
 
-    return render_template("admin_login.html")
+    return _cached_render("admin_login.html")
+
+
+HOME_PER_PAGE = 48
+MAX_PER_PAGE = 200
+
+
+def _iter_videos(names):
+    # Jinja consumes this lazily, so only one page of card dicts is ever built.
+    for f in names:
+        stem = f.rpartition(".")[0]
+        yield {
+            "name": f,
+            "title": stem.replace("_", " ").title(),
+            "thumb": f"{stem}.jpg",
+        }
 
 
 @app.route("/")
 @app.route("/home")
 @login_required
 def home():
-    videos = []
-    if VIDEO_PATH.exists():
-        for f in os.listdir(VIDEO_PATH):
-            if f.lower().endswith(tuple(VIDEO_EXTENSIONS)):
-                generate_thumbnail_opencv(f)
-                videos.append({
-                    "name": f,
-                    "title": Path(f).stem.replace("_", " ").title(),
-                    "thumb": f"{Path(f).stem}.jpg",
-                })
-    return render_template("home.html", videos=videos)
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", HOME_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    offset = (page - 1) * per_page
+
+    names = _listing(VIDEO_PATH, videos_only=True)
+    return render_template(
+        "home.html",
+        videos=_iter_videos(names[offset:offset + per_page]),
+        page=page,
+        per_page=per_page,
+        has_next=len(names) > offset + per_page,
+    )
 
 
 @app.route("/gallery")
@@ -299,12 +852,14 @@ def home():
 def gallery():
     images = []
     if IMAGE_PATH.exists():
-        for f in os.listdir(IMAGE_PATH):
-            if f.lower().endswith(tuple(IMAGE_EXTENSIONS)):
-                images.append({
-                    "name": f,
-                    "title": Path(f).stem.replace("_", " ").title()
-                })
+        with os.scandir(IMAGE_PATH) as it:
+            for entry in it:
+                f = entry.name
+                if entry.is_file(follow_symlinks=False) and is_image(f):
+                    images.append({
+                        "name": f,
+                        "title": f.rpartition(".")[0].replace("_", " ").title()
+                    })
     return render_template("gallery.html", images=images)
 
 
@@ -327,11 +882,12 @@ def creator_upload(plan_name: str):
             flash("Please choose a file.")
             return redirect(request.url)
 
-        if not allowed_file(file.filename):
+        # Validate the name that is actually saved; secure_filename can drop the stem.
+        safe_name = secure_filename(file.filename)
+        if not allowed_file(safe_name):
             flash("File type not allowed.")
             return redirect(request.url)
 
-        safe_name = secure_filename(file.filename)
         destination = safe_media_path(PENDING_PATH, safe_name)
 
         if destination.exists():
@@ -349,11 +905,9 @@ def creator_upload(plan_name: str):
 @login_required
 @admin_required
 def admin_panel():
-    pending_files = sorted([p.name for p in PENDING_PATH.iterdir() if p.is_file()])
-    approved_files = (
-        sorted([p.name for p in VIDEO_PATH.iterdir() if p.is_file()]) +
-        sorted([p.name for p in IMAGE_PATH.iterdir() if p.is_file()])
-    )
+    pending_files = _listing(PENDING_PATH)
+    # Both listings are already sorted, so merge them lazily instead of concatenating copies.
+    approved_files = heapq.merge(_listing(VIDEO_PATH), _listing(IMAGE_PATH))
     return render_template("admin.html", pending_files=pending_files, approved_files=approved_files)
 
 
@@ -374,11 +928,31 @@ def approve_media():
         flash("Destination already has a file with this name.")
         return redirect(url_for("admin_panel"))
 
-    shutil.move(str(source), str(destination))
+    move_file(source, destination)
+    _DIR_CACHE.pop(PENDING_PATH, None)
+    _DIR_CACHE.pop(destination_base, None)
+    if destination_base == VIDEO_PATH:
+        enqueue_thumbnail(destination.name)
     flash("Media approved and moved.")
     return redirect(url_for("admin_panel"))
 
 
+@app.post("/admin/thumbs/rebuild")
+@login_required
+@admin_required
+def rebuild_thumbnails():
+    missing = missing_thumbnails()
+    if thumbnail_worker_started():
+        # Names this process cannot hand over are found by the worker's next sweep.
+        for name in missing:
+            enqueue_thumbnail(name)
+        flash(f"{len(missing)} missing thumbnail(s) handed to the background worker.")
+    else:
+        queued = [name for name in missing if submit_thumbnail(name) is not None]
+        flash(f"Generating {len(queued)} missing thumbnail(s) in the background.")
+    return redirect(url_for("admin_panel"))
+
+
 @app.post("/admin/delete")
 @login_required
 @admin_required
@@ -387,16 +961,16 @@ def delete_media():
     location = request.form.get("location", "pending")
 
     if location == "pending":
-        target = safe_media_path(PENDING_PATH, filename)
+        base = PENDING_PATH
     else:
-        video_target = safe_media_path(VIDEO_PATH, filename)
-        image_target = safe_media_path(IMAGE_PATH, filename)
-        target = video_target if video_target.exists() else image_target
+        base = VIDEO_PATH if safe_media_path(VIDEO_PATH, filename).exists() else IMAGE_PATH
 
+    target = safe_media_path(base, filename)
     if not target.exists():
         abort(404)
 
     target.unlink()
+    _DIR_CACHE.pop(base, None)
     flash("File deleted.")
     return redirect(url_for("admin_panel"))
 
@@ -409,7 +983,7 @@ def rename_media():
     new_name = request.form.get("new_name", "")
     location = request.form.get("location", "pending")
 
-    if not new_name or not allowed_file(new_name):
+    if not new_name or not allowed_file(secure_filename(new_name)):
         flash("Invalid new name or extension.")
         return redirect(url_for("admin_panel"))
 
@@ -428,7 +1002,10 @@ def rename_media():
         flash("A file with that name already exists.")
         return redirect(url_for("admin_panel"))
 
-    source.rename(destination)
+    os.replace(source, destination)
+    _DIR_CACHE.pop(base, None)
+    if base == VIDEO_PATH:
+        enqueue_thumbnail(destination.name)
     flash("File renamed.")
     return redirect(url_for("admin_panel"))
 
@@ -439,7 +1016,7 @@ def stream_video(filename):
     file_path = find_existing_file(VIDEO_PATH, filename)
     if not file_path:
         abort(404)
-    return send_file(file_path, conditional=True)
+    return stream_media_file(file_path)
 
 
 @app.route("/serve_image/<path:filename>")
@@ -447,11 +1024,11 @@ def stream_video(filename):
 def serve_image(filename):
     approved_image = find_existing_file(IMAGE_PATH, filename)
     if approved_image:
-        return send_file(approved_image)
+        return send_media(approved_image)
 
     pending_image = find_existing_file(PENDING_PATH, filename)
     if pending_image and session.get("is_admin"):
-        return send_file(pending_image)
+        return send_media(pending_image)
 
     abort(404)
 
@@ -461,15 +1038,33 @@ def serve_image(filename):
 def serve_thumb(filename):
     path = find_existing_file(THUMB_PATH, filename)
     if path:
-        return send_file(path)
+        return send_media(path)
 
     alt_path = find_existing_file(ALT_THUMB_PATH, filename)
     if alt_path:
-        return send_file(alt_path)
+        return send_media(alt_path)
+
+    video_name = find_video_for_thumb(filename)
+    future = None
+    if video_name and thumbnail_worker_started():
+        # Decoding belongs to the worker process; answer with the placeholder right away.
+        enqueue_thumbnail(video_name)
+    elif video_name:
+        future = submit_thumbnail(video_name)
+    if future is not None:
+        try:
+            ready = future.result(timeout=THUMB_WAIT_SECONDS)
+        except FutureTimeoutError:
+            # Still queued behind other work (e.g. an admin rebuild); the next view will find it.
+            ready = False
+        if ready:
+            path = find_existing_file(THUMB_PATH, filename)
+            if path:
+                return send_media(path)
 
     default_img = find_existing_file(IMAGE_PATH, "default.jpg")
     if default_img:
-        return send_file(default_img)
+        return send_media(default_img)
 
     abort(404)
 
@@ -482,4 +1077,7 @@ def logout():
 
 
 if __name__ == "__main__":
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _clear_render_cache)
+    start_thumbnail_worker()
     app.run(debug=False, host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    # app.py creates its media folders under BASE_DIR at import; keep them out of the checkout.
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("import-root"))
+    try:
+        return importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module, tmp_path, monkeypatch):
+    video_dir = tmp_path / "vedios"
+    video_dir.mkdir()
+    monkeypatch.setattr(app_module, "VIDEO_PATH", video_dir)
+    monkeypatch.setattr(app_module, "load_login_users", lambda: {"tester": {"password": "x", "role": "user"}})
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "tester"
+        sess["_fresh"] = True
+    return client
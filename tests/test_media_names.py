@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.mark.parametrize("name", ["clip.mp4", "CLIP.MKV", "a.b.webm", "photo.JPeg", "dir/clip.mov"])
+def test_allowed_file_accepts_media(app_module, name):
+    assert app_module.allowed_file(name)
+
+
+@pytest.mark.parametrize("name", [".mp4", "dir/.mp4", "dir\\.mp4", "mp4", "clip.", "clip.txt", ""])
+def test_allowed_file_rejects_bare_or_unknown_extensions(app_module, name):
+    assert not app_module.allowed_file(name)
+
+
+def test_media_kind(app_module):
+    assert app_module.media_kind("clip.MP4") == "video"
+    assert app_module.media_kind("photo.png") == "image"
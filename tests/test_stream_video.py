@@ -0,0 +1,71 @@
+import pytest
+
+PAYLOAD = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def video(client, app_module):
+    (app_module.VIDEO_PATH / "clip.mp4").write_bytes(PAYLOAD)
+    return "/video/clip.mp4"
+
+
+def test_full_body_without_range(client, video):
+    rv = client.get(video)
+    assert rv.status_code == 200
+    assert rv.data == PAYLOAD
+    assert rv.headers["Accept-Ranges"] == "bytes"
+    assert rv.headers["Content-Length"] == str(len(PAYLOAD))
+    assert rv.headers["ETag"]
+
+
+def test_open_ended_range(client, video):
+    rv = client.get(video, headers={"Range": "bytes=1000-"})
+    assert rv.status_code == 206
+    assert rv.data == PAYLOAD[1000:]
+    assert rv.headers["Content-Range"] == f"bytes 1000-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"
+
+
+def test_bounded_range(client, video):
+    rv = client.get(video, headers={"Range": "bytes=10-19"})
+    assert rv.status_code == 206
+    assert rv.data == PAYLOAD[10:20]
+    assert rv.headers["Content-Length"] == "10"
+
+
+def test_unsatisfiable_range(client, video):
+    rv = client.get(video, headers={"Range": f"bytes={len(PAYLOAD)}-"})
+    assert rv.status_code == 416
+    assert rv.headers["Content-Range"] == f"bytes */{len(PAYLOAD)}"
+
+
+def test_multi_range_falls_back_to_full_body(client, video):
+    rv = client.get(video, headers={"Range": "bytes=0-9,20-29"})
+    assert rv.status_code == 200
+    assert rv.data == PAYLOAD
+
+
+def test_if_none_match_returns_304(client, video):
+    etag = client.get(video).headers["ETag"]
+    rv = client.get(video, headers={"If-None-Match": etag})
+    assert rv.status_code == 304
+    assert rv.data == b""
+
+
+def test_if_range_match_honours_range(client, video):
+    etag = client.get(video).headers["ETag"]
+    rv = client.get(video, headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert rv.status_code == 206
+    assert rv.data == PAYLOAD[10:20]
+
+
+def test_stale_if_range_sends_full_body(client, video):
+    rv = client.get(video, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert rv.status_code == 200
+    assert rv.data == PAYLOAD
+
+
+def test_weak_if_range_sends_full_body(client, video):
+    etag = client.get(video).headers["ETag"]
+    rv = client.get(video, headers={"Range": "bytes=0-1", "If-Range": f"W/{etag}"})
+    assert rv.status_code == 200
+    assert rv.data == PAYLOAD